@@ -3,23 +3,53 @@
 Authentication functions for MCP server
 """
 
-from fastapi import HTTPException, Depends
-from fastapi.security import APIKeyHeader
+import hmac
 
 try:
     from .config import API_KEY, API_KEY_NAME
 except ImportError:
     from config import API_KEY, API_KEY_NAME
 
-# Create API key header dependency
-api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
+# Encode the expected key and header name once so each check works on raw ASGI bytes
+_API_KEY_BYTES = API_KEY.encode() if API_KEY else None
+_API_KEY_HEADER = API_KEY_NAME.lower().encode()
 
+_UNAUTHORIZED_BODY = b'{"detail":"Invalid or missing API key"}'
+_UNAUTHORIZED_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_UNAUTHORIZED_BODY)).encode()),
+]
 
-def verify_api_key(api_key: str = Depends(api_key_header)):
-    """Verify the API key from request headers."""
-    if API_KEY and api_key != API_KEY:
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid or missing API key"
-        )
-    return api_key
\ No newline at end of file
+
+def is_valid_api_key(api_key: bytes) -> bool:
+    """Check an API key against the configured one in constant time."""
+    return hmac.compare_digest(api_key, _API_KEY_BYTES)
+
+
+class APIKeyMiddleware:
+    """ASGI middleware that rejects HTTP requests without a valid API key."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and _API_KEY_BYTES:
+            api_key = b""
+            for name, value in scope["headers"]:
+                if name == _API_KEY_HEADER:
+                    api_key = value
+                    break
+
+            if not is_valid_api_key(api_key):
+                await send({
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": _UNAUTHORIZED_HEADERS,
+                })
+                await send({
+                    "type": "http.response.body",
+                    "body": _UNAUTHORIZED_BODY,
+                })
+                return
+
+        await self.app(scope, receive, send)
\ No newline at end of file
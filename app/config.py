@@ -10,7 +10,12 @@ SERVER_NAME = "simple-utils-server"
 SERVER_VERSION = "1.0.0"
 
 # Logging configuration
+LOG_REQUESTS = os.getenv("MCP_LOG_REQUESTS", "1") == "1"
+LOG_SAMPLE_RATE = float(os.getenv("MCP_LOG_SAMPLE", "1.0"))  # fraction of requests logged
 LOG_FILE = "logs/requests_log.txt"
+LOG_FLUSH_INTERVAL = 0.05  # minimum seconds between batched log writes
+LOG_BUFFER_SIZE = 4 * 1024 * 1024  # bytes buffered by the log file handle
+LOG_QUEUE_SIZE = 10_000  # pending entries before new ones are dropped
 
 # Authentication configuration
 API_KEY = os.getenv("MCP_API_KEY")
@@ -19,13 +24,30 @@ API_KEY_NAME = "X-API-Key"
 # Server settings
 PORT = int(os.getenv("PORT", "8000"))
 HOST = "0.0.0.0"
+WORKERS = int(os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
 
-# CORS settings
+# Request profiling (requires pyinstrument); when enabled, add ?profile=1 to a request
+PROFILING = os.getenv("MCP_PROFILING", "0") == "1"
+
+# CORS settings; set MCP_CORS=0 when only non-browser MCP clients connect
+CORS_ENABLED = os.getenv("MCP_CORS", "1") == "1"
 CORS_ORIGINS = [
     "http://localhost:8000",
     "http://127.0.0.1:8000",
 ]
 
+# Response compression
+GZIP_MINIMUM_SIZE = 1024  # bytes; smaller responses are sent uncompressed
+GZIP_COMPRESS_LEVEL = 5
+
 # Timeouts
 COMMAND_TIMEOUT = 30  # seconds for shell commands
-MAX_RANDOM_NUMBERS = 100  # maximum count for random number generation
\ No newline at end of file
+COMMAND_OUTPUT_LIMIT = 10 * 1024 * 1024  # bytes of stdout/stderr kept per command (the tail)
+SSE_KEEPALIVE_INTERVAL = 30  # seconds between SSE keepalive comments
+MAX_BODY_BYTES = 64 * 1024  # maximum JSON-RPC request body size
+MAX_RANDOM_NUMBERS = 100  # maximum count for random number generation
+
+# Tool result memoization
+TOOL_RESULT_CACHE_SIZE = 1024  # maximum memoized (tool, arguments) results
+# Tools whose results depend only on their arguments; clock-based tools must never be listed
+MEMOIZED_TOOLS = frozenset({"calculate"})
\ No newline at end of file
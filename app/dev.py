@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Development entrypoint for MCP server with auto-reload
+"""
+
+import uvicorn
+
+try:
+    from .config import HOST, PORT
+except ImportError:
+    from config import HOST, PORT
+
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "server:app",
+        host=HOST,
+        port=PORT,
+        reload=True
+    )
\ No newline at end of file
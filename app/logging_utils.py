@@ -3,91 +3,222 @@
 Logging utilities for MCP server
 """
 
+import asyncio
+import itertools
 import json
 import os
+import random
 import sys
-import uuid
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
+import orjson
 from fastapi import Request
 
 try:
-    from .config import LOG_FILE
+    from .config import LOG_REQUESTS, LOG_SAMPLE_RATE, LOG_FILE, LOG_FLUSH_INTERVAL, LOG_BUFFER_SIZE, LOG_QUEUE_SIZE
 except ImportError:
-    from config import LOG_FILE
+    from config import LOG_REQUESTS, LOG_SAMPLE_RATE, LOG_FILE, LOG_FLUSH_INTERVAL, LOG_BUFFER_SIZE, LOG_QUEUE_SIZE
 
+# Background log writer state (set up by start_log_writer)
+_log_queue: Optional[asyncio.Queue] = None
+_dropped_log_entries = 0
+_log_file = None
+_log_writer_task: Optional[asyncio.Task] = None
+_log_dir_ready = False
 
-def log_request(request_info: dict):
-    """Log request information to a text file."""
-    try:
-        # Ensure log directory exists
+# Request IDs: process start time and PID, plus a per-process counter
+_REQUEST_ID_PREFIX = f"{int(time.time()):x}-{os.getpid():x}-"
+_request_counter = itertools.count()
+
+
+def next_request_id() -> str:
+    """Return a request ID unique across processes and restarts, without using uuid4()."""
+    return f"{_REQUEST_ID_PREFIX}{next(_request_counter):x}"
+
+
+# ISO timestamp cached at one-second resolution: [epoch second, ISO string]
+_TS_CACHE = [0, ""]
+
+
+def now_iso() -> str:
+    """Return the current UTC time as an ISO 8601 string, recomputed once per second."""
+    second = int(time.time())
+    cache = _TS_CACHE
+    if cache[0] != second:
+        cache[1] = datetime.fromtimestamp(second, timezone.utc).isoformat()
+        cache[0] = second
+    return cache[1]
+
+
+def _open_log_file(buffering: int = LOG_BUFFER_SIZE):
+    """Open the log file for appending, creating its directory on first use."""
+    global _log_dir_ready
+    if not _log_dir_ready:
         log_dir = os.path.dirname(LOG_FILE)
-        if log_dir and not os.path.exists(log_dir):
+        if log_dir:
             os.makedirs(log_dir, exist_ok=True)
+        _log_dir_ready = True
+    return open(LOG_FILE, "ab", buffering=buffering)
+
+
+def _flush_log_queue(entries: list):
+    """Drain the log queue into entries and write them to the log file in a single batch."""
+    while not _log_queue.empty():
+        entries.append(_log_queue.get_nowait())
+    if entries:
+        _log_file.write(b"".join(_encode_log_entry(timestamp, request_info) for timestamp, request_info in entries))
+        _log_file.flush()
+
+
+async def _log_writer():
+    """Wait for queued log entries and write them to disk in batches."""
+    while True:
+        try:
+            entries = [await _log_queue.get()]
+            _flush_log_queue(entries)
+        except Exception as e:
+            # Keep the writer alive: entries are only queued while it runs
+            print(f"Logging error: {e}", file=sys.stderr)
+        # Let entries accumulate so bursts are written together
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+
+
+async def start_log_writer():
+    """Open the log file and start the background writer task."""
+    global _log_queue, _log_file, _log_writer_task
+    if not LOG_REQUESTS:
+        return
+    # Created here rather than at import so the queue belongs to the running event loop
+    _log_queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+    _log_file = _open_log_file()
+    _log_writer_task = asyncio.create_task(_log_writer())
+
+
+async def stop_log_writer():
+    """Stop the background writer and flush any remaining entries."""
+    global _log_queue, _log_file, _log_writer_task, _dropped_log_entries
+    if _log_writer_task:
+        _log_writer_task.cancel()
+        try:
+            await _log_writer_task
+        except asyncio.CancelledError:
+            pass
+        _log_writer_task = None
+    if _log_file:
+        _flush_log_queue([])
+        _log_file.close()
+        _log_file = None
+    _log_queue = None
+    if _dropped_log_entries:
+        print(f"Logging: dropped {_dropped_log_entries} entries while the log queue was full", file=sys.stderr)
+        _dropped_log_entries = 0
+
+
+def _encode_log_entry(timestamp: str, request_info: dict) -> bytes:
+    """Serialize a log record as a single line of JSON."""
+    # Reuse the request ID assigned by the caller, generating one only if missing
+    request_id = request_info.get("server_info", {}).get("request_id") or next_request_id()
+    entry = {
+        "id": request_id,
+        "timestamp": timestamp,
+        "request": request_info,
+    }
+    try:
+        return orjson.dumps(entry, default=str, option=orjson.OPT_APPEND_NEWLINE)
+    except orjson.JSONEncodeError:
+        # orjson rejects values such as integers beyond 64 bits
+        return (json.dumps(entry, default=str, ensure_ascii=False) + "\n").encode("utf-8")
 
-        # Generate unique request ID
-        request_id = str(uuid.uuid4())
-
-        # Format timestamp
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
 
-        # Build log entry
-        log_entry = f"""
-{'='*80}
-REQUEST LOG ENTRY - {request_id}
-Timestamp: {timestamp}
-{'='*80}
+def should_log() -> bool:
+    """Decide whether to log a request, honouring LOG_REQUESTS and LOG_SAMPLE_RATE."""
+    return LOG_REQUESTS and (LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE)
 
-REQUEST INFORMATION:
-{json.dumps(request_info, indent=2, default=str)}
 
-{'='*80}
-END OF ENTRY
-{'='*80}
+def write_log_entry(request_info: dict):
+    """Write a log entry that has already passed should_log().
 
-"""
+    The entry is queued for the background writer, or written directly if the writer isn't running.
+    """
+    global _dropped_log_entries
+    try:
+        if _log_writer_task:
+            # Encoding happens in the writer task, off the request path
+            _log_queue.put_nowait((now_iso(), request_info))
+        else:
+            with _open_log_file(buffering=-1) as f:
+                f.write(_encode_log_entry(now_iso(), request_info))
 
-        # Append to log file
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_entry)
+    except asyncio.QueueFull:
+        # The writer can't keep up; shed entries rather than grow without bound
+        _dropped_log_entries += 1
 
     except Exception as e:
         # If logging fails, print to stderr but don't break the main functionality
         print(f"Logging error: {e}", file=sys.stderr)
 
 
+# (log field, header name) pairs captured in client_info
+CLIENT_LOG_HEADERS = (
+    ("user_agent", "user-agent"),
+    ("accept", "accept"),
+    ("content_type", "content-type"),
+    ("host", "host"),
+    ("connection", "connection"),
+    ("referer", "referer"),
+    ("origin", "origin"),
+    ("x_forwarded_for", "x-forwarded-for"),
+    ("x_real_ip", "x-real-ip"),
+)
+
+
+def build_client_info(request: Request) -> dict:
+    """Collect client address and logged headers, once per request.
+
+    The result is cached on request.state so the HTTP and tool-call log entries share it.
+    """
+    client_info = getattr(request.state, "client_info", None)
+    if client_info is None:
+        client = request.client
+        headers = request.headers
+        client_info = {
+            "ip_address": client.host if client else None,
+            "port": client.port if client else None,
+        }
+        for field, header in CLIENT_LOG_HEADERS:
+            client_info[field] = headers.get(header)
+        request.state.client_info = client_info
+    return client_info
+
+
 def log_http_request(request: Request, endpoint: str, additional_info: dict = None):
-    """Log HTTP request information."""
+    """Log HTTP request information.
+
+    Endpoints schedule this as a background task, so the entry is built after the response is sent.
+    """
+    if not should_log():
+        return
     try:
         request_info = {
             "request_type": "http_request",
             "endpoint": endpoint,
             "method": request.method,
             "url": str(request.url),
-            "client_info": {
-                "ip_address": request.client.host if hasattr(request, 'client') and request.client else None,
-                "port": request.client.port if hasattr(request, 'client') and request.client else None,
-                "user_agent": request.headers.get('user-agent'),
-                "accept": request.headers.get('accept'),
-                "content_type": request.headers.get('content-type'),
-                "host": request.headers.get('host'),
-                "connection": request.headers.get('connection'),
-                "referer": request.headers.get('referer'),
-                "origin": request.headers.get('origin'),
-            },
+            "client_info": build_client_info(request),
             "server_info": {
                 "server_name": "simple-utils-server",
                 "server_version": "1.0.0",
-                "request_id": str(uuid.uuid4()),
+                "request_id": next_request_id(),
             },
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": now_iso()
         }
 
         if additional_info:
             request_info.update(additional_info)
 
-        log_request(request_info)
+        write_log_entry(request_info)
 
     except Exception as e:
         print(f"HTTP request logging error: {e}", file=sys.stderr)
@@ -99,19 +230,13 @@ def create_tool_log_info(name: str, arguments: dict[str, Any], request: Request
         "request_type": "tool_call",
         "tool_name": name,
         "arguments": arguments,
-        "client_info": {
-            "ip_address": request.client.host if request and hasattr(request, 'client') and request.client else None,
-            "port": request.client.port if request and hasattr(request, 'client') and request.client else None,
-            "user_agent": request.headers.get('user-agent') if request else None,
-            "accept": request.headers.get('accept') if request else None,
-            "content_type": request.headers.get('content-type') if request else None,
-            "host": request.headers.get('host') if request else None,
-            "connection": request.headers.get('connection') if request else None,
-        } if request else {},
+        "endpoint": request.url.path if request else None,
+        "url": str(request.url) if request else None,
+        "client_info": build_client_info(request) if request else {},
         "server_info": {
             "server_name": "simple-utils-server",
             "server_version": "1.0.0",
-            "request_id": str(uuid.uuid4()),
+            "request_id": next_request_id(),
         },
-        "timestamp_start": datetime.now(timezone.utc).isoformat(),
+        "timestamp_start": now_iso(),
     }
\ No newline at end of file
@@ -5,209 +5,362 @@ Allows remote connections via HTTP Server-Sent Events
 """
 
 import asyncio
-import json
-from datetime import datetime, timezone
-from fastapi import FastAPI, Request, Depends
-from fastapi.responses import StreamingResponse, JSONResponse
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi.responses import HTMLResponse, Response, StreamingResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from mcp.types import TextContent
+import orjson
 import uvicorn
 
 try:
     # Try relative imports (when run as module)
-    from .config import HOST, PORT, CORS_ORIGINS
-    from .auth import verify_api_key
-    from .logging_utils import log_http_request
+    from .config import (
+        HOST, PORT, WORKERS, CORS_ENABLED, CORS_ORIGINS, SERVER_NAME, SERVER_VERSION,
+        SSE_KEEPALIVE_INTERVAL, MAX_BODY_BYTES, GZIP_MINIMUM_SIZE, GZIP_COMPRESS_LEVEL, PROFILING
+    )
+    from .auth import APIKeyMiddleware
+    from .logging_utils import log_http_request, now_iso, start_log_writer, stop_log_writer
     from .tools import server, list_tools, call_tool
 except ImportError:
     # Fall back to absolute imports (when run directly)
-    from config import HOST, PORT, CORS_ORIGINS
-    from auth import verify_api_key
-    from logging_utils import log_http_request
+    from config import (
+        HOST, PORT, WORKERS, CORS_ENABLED, CORS_ORIGINS, SERVER_NAME, SERVER_VERSION,
+        SSE_KEEPALIVE_INTERVAL, MAX_BODY_BYTES, GZIP_MINIMUM_SIZE, GZIP_COMPRESS_LEVEL, PROFILING
+    )
+    from auth import APIKeyMiddleware
+    from logging_utils import log_http_request, now_iso, start_log_writer, stop_log_writer
     from tools import server, list_tools, call_tool
 
 
+# Static payloads, built once instead of per request
+INITIALIZE_RESULT = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {
+            "listChanged": True
+        }
+    },
+    "serverInfo": {
+        "name": SERVER_NAME,
+        "version": SERVER_VERSION
+    }
+}
+ROOT_RESPONSE_BYTES = orjson.dumps({"message": "Simple MCP Server", "status": "running"})
+HEALTH_RESPONSE_TEMPLATE = b'{"status":"healthy","timestamp":"%s"}'
+HEALTH_HEADERS = {"Cache-Control": "private, max-age=1"}
+
+# Pre-encoded SSE framing
+SSE_KEEPALIVE_FRAME = b": keepalive\n\n"
+SSE_DATA_PREFIX = b"data: "
+SSE_FRAME_END = b"\n\n"
+
+# Filled in at startup from list_tools(); refresh with refresh_tools_cache()
+tools_response_bytes: bytes = b""
+# Pre-encoded tools/list result, spliced verbatim into JSON-RPC envelopes by orjson
+tools_result_fragment: orjson.Fragment = orjson.Fragment(b"{}")
+
+
+async def refresh_tools_cache():
+    """Build the tools/list result and its serialized form.
+
+    Runs once at startup; call it again whenever the tool registry changes.
+    """
+    global tools_response_bytes, tools_result_fragment
+    tools = await list_tools()
+    tools_result = {
+        "tools": [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "inputSchema": tool.inputSchema
+            }
+            for tool in tools
+        ]
+    }
+    tools_response_bytes = orjson.dumps(tools_result)
+    tools_result_fragment = orjson.Fragment(tools_response_bytes)
+
+
+# Shared keepalive signal, set once per interval for every open SSE stream (created in lifespan)
+keepalive_event: Optional[asyncio.Event] = None
+
+
+async def keepalive_ticker():
+    """Wake all SSE streams once every SSE_KEEPALIVE_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(SSE_KEEPALIVE_INTERVAL)
+        keepalive_event.set()
+        keepalive_event.clear()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare cached payloads and run the background tasks for the lifetime of the app."""
+    global keepalive_event
+    await refresh_tools_cache()
+    await start_log_writer()
+    keepalive_event = asyncio.Event()
+    keepalive_task = asyncio.create_task(keepalive_ticker())
+    try:
+        yield
+    finally:
+        keepalive_task.cancel()
+        await stop_log_writer()
+
+
 # Create FastAPI app
-app = FastAPI(title="Simple MCP Server")
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = FastAPI(title="Simple MCP Server", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Opt-in profiling: registered before the other middleware so it only sees authenticated requests
+if PROFILING:
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """Return a pyinstrument HTML report instead of the response for ?profile=1 requests."""
+        if request.query_params.get("profile") != "1":
+            return await call_next(request)
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
+# Add API key middleware (added first so CORS wraps it and preflight requests skip auth)
+app.add_middleware(APIKeyMiddleware)
+
+# Compress large JSON responses (SSE streams are left uncompressed by GZipMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+
+# Add CORS middleware, skipped entirely when disabled so requests don't pay for it
+if CORS_ENABLED:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 
 @app.get("/")
-async def root(request: Request, api_key: str = Depends(verify_api_key)):
+async def root(request: Request, background_tasks: BackgroundTasks):
     """Root endpoint."""
-    log_http_request(request, "/")
-    return {"message": "Simple MCP Server", "status": "running"}
+    background_tasks.add_task(log_http_request, request, "/")
+    return Response(ROOT_RESPONSE_BYTES, media_type="application/json")
 
 
 @app.get("/health")
-async def health(request: Request, api_key: str = Depends(verify_api_key)):
-    """Health check endpoint."""
-    log_http_request(request, "/health")
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+async def health():
+    """Health check endpoint (not logged, as it is polled by probes)."""
+    return Response(
+        HEALTH_RESPONSE_TEMPLATE % now_iso().encode(),
+        media_type="application/json",
+        headers=HEALTH_HEADERS
+    )
 
 
 @app.get("/mcp/tools")
-async def mcp_tools(request: Request, api_key: str = Depends(verify_api_key)):
+async def mcp_tools(request: Request, background_tasks: BackgroundTasks):
     """List available MCP tools."""
-    log_http_request(request, "/mcp/tools")
-    tools = await list_tools()
-    return {"tools": [{"name": tool.name, "description": tool.description, "inputSchema": tool.inputSchema} for tool in tools]}
+    background_tasks.add_task(log_http_request, request, "/mcp/tools")
+    return Response(tools_response_bytes, media_type="application/json")
 
 
-@app.post("/mcp/call")
-async def mcp_call(request: Request, api_key: str = Depends(verify_api_key)):
-    """Handle MCP JSON-RPC calls."""
+class JSONRPCError(Exception):
+    """Error raised by a JSON-RPC method handler."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def rpc_error(request_id, code: int, message: str) -> dict:
+    """Build a JSON-RPC error envelope."""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": code,
+            "message": message
+        }
+    }
+
+
+def tool_content(result) -> list:
+    """Convert call_tool results into JSON-RPC content items."""
+    return [
+        {"type": item.type, "text": item.text} if type(item) is TextContent else str(item)
+        for item in result
+    ]
+
+
+async def rpc_initialize(params: dict, request: Request, background_tasks: BackgroundTasks) -> dict:
+    """Handle the MCP initialize method."""
+    return INITIALIZE_RESULT
+
+
+async def rpc_tools_list(params: dict, request: Request, background_tasks: BackgroundTasks) -> orjson.Fragment:
+    """Handle the MCP tools/list method."""
+    return tools_result_fragment
+
+
+async def rpc_tools_call(params: dict, request: Request, background_tasks: BackgroundTasks) -> dict:
+    """Handle the MCP tools/call method."""
+    name = params.get("name")
+    arguments = params.get("arguments", {})
+
+    if not name:
+        raise JSONRPCError(-32602, "Tool name is required")
+
+    try:
+        result = await call_tool(name, arguments, request)
+    except Exception as e:
+        # call_tool didn't get to log this request, so record it here
+        background_tasks.add_task(
+            log_http_request, request, request.url.path, {"method": "tools/call", "params": params, "error": str(e)}
+        )
+        raise JSONRPCError(-32603, f"Tool execution error: {str(e)}")
+
+    return {"content": tool_content(result)}
+
+
+# JSON-RPC method dispatch table
+RPC_HANDLERS = {
+    "initialize": rpc_initialize,
+    "tools/list": rpc_tools_list,
+    "tools/call": rpc_tools_call,
+}
+
+
+async def dispatch_rpc(body, request: Request, endpoint: str, background_tasks: BackgroundTasks) -> tuple[int, Optional[dict]]:
+    """Validate and dispatch one decoded JSON-RPC message, returning (HTTP status, response envelope).
+
+    The envelope is None for notifications (requests without an id), which get no response.
+    """
     try:
-        body = await request.json()
+        if type(body) is not dict:
+            return 400, rpc_error(None, -32600, "Invalid Request")
 
         # Validate JSON-RPC 2.0 format
+        request_id = body.get("id")
         if body.get("jsonrpc") != "2.0":
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "jsonrpc": "2.0",
-                    "id": body.get("id"),
-                    "error": {
-                        "code": -32600,
-                        "message": "Invalid JSON-RPC version"
-                    }
-                }
-            )
+            return 400, rpc_error(request_id, -32600, "Invalid JSON-RPC version")
 
         method = body.get("method")
         params = body.get("params", {})
-        request_id = body.get("id")
+        if type(method) is not str or type(params) is not dict:
+            return 400, rpc_error(request_id, -32600, "Invalid Request")
 
-        log_http_request(request, "/mcp/call", {"method": method, "params": params})
+        # call_tool writes a single entry covering both the HTTP request and the tool call,
+        # so only log here when the request won't reach it
+        if method != "tools/call" or not params.get("name"):
+            background_tasks.add_task(log_http_request, request, endpoint, {"method": method, "params": params})
 
         # Handle MCP protocol methods
-        if method == "initialize":
-            # MCP initialization
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {
-                            "listChanged": True
-                        }
-                    },
-                    "serverInfo": {
-                        "name": "simple-utils-server",
-                        "version": "1.0.0"
-                    }
-                }
-            }
+        handler = RPC_HANDLERS.get(method)
 
-        elif method == "tools/list":
-            # List available tools
-            tools = await list_tools()
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "tools": [
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        }
-                        for tool in tools
-                    ]
-                }
-            }
+        # Notifications still run, but skip building any response
+        if "id" not in body:
+            if handler is not None:
+                try:
+                    await handler(params, request, background_tasks)
+                except JSONRPCError:
+                    pass
+            return 202, None
 
-        elif method == "tools/call":
-            name = params.get("name")
-            arguments = params.get("arguments", {})
-
-            if not name:
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32602,
-                        "message": "Tool name is required"
-                    }
-                }
-
-            try:
-                result = await call_tool(name, arguments, request)
-                # Extract content from TextContent objects
-                content = []
-                for item in result:
-                    if hasattr(item, 'type') and hasattr(item, 'text'):
-                        content.append({
-                            "type": item.type,
-                            "text": item.text
-                        })
-                    else:
-                        content.append(str(item))
-
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": content
-                    }
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32603,
-                        "message": f"Tool execution error: {str(e)}"
-                    }
-                }
-
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "error": {
-                    "code": -32601,
-                    "message": f"Method not found: {method}"
-                }
-            }
+        if handler is None:
+            return 200, rpc_error(request_id, -32601, f"Method not found: {method}")
+
+        try:
+            result = await handler(params, request, background_tasks)
+        except JSONRPCError as e:
+            return 200, rpc_error(request_id, e.code, e.message)
+
+        return 200, {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result
+        }
 
-    except json.JSONDecodeError:
-        return JSONResponse(
-            status_code=400,
-            content={
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32700,
-                    "message": "Parse error"
-                }
-            }
-        )
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32603,
-                    "message": f"Internal error: {str(e)}"
-                }
-            }
-        )
+        return 500, rpc_error(None, -32603, f"Internal error: {str(e)}")
+
+
+async def read_body(request: Request, limit: int) -> Optional[bytes]:
+    """Read the request body, or return None as soon as it grows past limit bytes.
+
+    Covers chunked requests without a Content-Length, which request.body() would buffer in full.
+    """
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        if len(buffer) > limit:
+            return None
+    return bytes(buffer)
+
+
+async def handle_rpc(request: Request, endpoint: str, background_tasks: BackgroundTasks) -> tuple[int, Optional[Union[dict, list]]]:
+    """Parse and dispatch a JSON-RPC request or batch, returning (HTTP status, response envelope).
+
+    Batch members are dispatched concurrently and answered with a list of envelopes,
+    leaving out notifications; the envelope is None when nothing needs a response.
+    The request log entry is queued on background_tasks so it is written after the response is sent.
+    """
+    try:
+        # Reject oversized bodies up front when the client declares their size
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_BODY_BYTES:
+            return 413, rpc_error(None, -32600, "Request body too large")
+
+        body_bytes = await read_body(request, MAX_BODY_BYTES)
+        if body_bytes is None:
+            return 413, rpc_error(None, -32600, "Request body too large")
+
+        body = orjson.loads(body_bytes)
+    except orjson.JSONDecodeError:
+        return 400, rpc_error(None, -32700, "Parse error")
+    except Exception as e:
+        return 500, rpc_error(None, -32603, f"Internal error: {str(e)}")
+
+    if type(body) is not list:
+        return await dispatch_rpc(body, request, endpoint, background_tasks)
+
+    if not body:
+        return 400, rpc_error(None, -32600, "Invalid Request")
+
+    results = await asyncio.gather(*(dispatch_rpc(message, request, endpoint, background_tasks) for message in body))
+    envelopes = [envelope for _, envelope in results if envelope is not None]
+    if not envelopes:
+        return 202, None
+    return 200, envelopes
+
+
+def sse_frame_response(message: Union[dict, list]) -> Response:
+    """Send a single JSON-RPC message as one complete SSE data frame."""
+    return Response(
+        SSE_DATA_PREFIX + orjson.dumps(message) + SSE_FRAME_END,
+        media_type="text/event-stream"
+    )
+
+
+@app.post("/mcp/call")
+async def mcp_call(request: Request, background_tasks: BackgroundTasks):
+    """Handle MCP JSON-RPC calls."""
+    status_code, response = await handle_rpc(request, "/mcp/call", background_tasks)
+    if response is None:
+        return Response(status_code=status_code)
+    return ORJSONResponse(status_code=status_code, content=response)
 
 
 @app.get("/sse")
-async def sse_endpoint(request: Request, api_key: str = Depends(verify_api_key)):
+async def sse_endpoint(request: Request):
     """Server-Sent Events endpoint for MCP."""
+    # Log inline: background tasks would only run once the stream closes
     log_http_request(request, "/sse")
 
     async def event_generator():
@@ -215,8 +368,8 @@ async def sse_endpoint(request: Request, api_key: str = Depends(verify_api_key))
         try:
             # Keep connection alive with occasional comments
             while True:
-                await asyncio.sleep(30)  # Send keep-alive every 30 seconds
-                yield ": keepalive\n\n"
+                await keepalive_event.wait()
+                yield SSE_KEEPALIVE_FRAME
 
         except asyncio.CancelledError:
             # Connection closed by client
@@ -230,172 +383,29 @@ async def sse_endpoint(request: Request, api_key: str = Depends(verify_api_key))
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "Cache-Control",
+            "X-Accel-Buffering": "no",
         }
     )
 
 
 @app.post("/sse")
-async def sse_post_endpoint(request: Request, api_key: str = Depends(verify_api_key)):
+async def sse_post_endpoint(request: Request, background_tasks: BackgroundTasks):
     """Handle POST requests to SSE endpoint for MCP calls."""
-    try:
-        body = await request.json()
-
-        # Validate JSON-RPC 2.0 format
-        if body.get("jsonrpc") != "2.0":
-            response = {
-                "jsonrpc": "2.0",
-                "id": body.get("id"),
-                "error": {
-                    "code": -32600,
-                    "message": "Invalid JSON-RPC version"
-                }
-            }
-
-            async def error_generator():
-                yield f"data: {json.dumps(response)}\n\n"
-
-            return StreamingResponse(
-                error_generator(),
-                media_type="text/event-stream"
-            )
-
-        method = body.get("method")
-        params = body.get("params", {})
-        request_id = body.get("id")
-
-        log_http_request(request, "/sse", {"method": method, "params": params})
-
-        # Handle MCP protocol methods
-        if method == "initialize":
-            response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {
-                            "listChanged": True
-                        }
-                    },
-                    "serverInfo": {
-                        "name": "simple-utils-server",
-                        "version": "1.0.0"
-                    }
-                }
-            }
-
-        elif method == "tools/list":
-            tools = await list_tools()
-            response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "tools": [
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        }
-                        for tool in tools
-                    ]
-                }
-            }
-
-        elif method == "tools/call":
-            name = params.get("name")
-            arguments = params.get("arguments", {})
-
-            if not name:
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32602,
-                        "message": "Tool name is required"
-                    }
-                }
-            else:
-                try:
-                    result = await call_tool(name, arguments, request)
-                    # Extract content from TextContent objects
-                    content = []
-                    for item in result:
-                        if hasattr(item, 'type') and hasattr(item, 'text'):
-                            content.append({
-                                "type": item.type,
-                                "text": item.text
-                            })
-                        else:
-                            content.append(str(item))
-
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "content": content
-                        }
-                    }
-                except Exception as e:
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "error": {
-                            "code": -32603,
-                            "message": f"Tool execution error: {str(e)}"
-                        }
-                    }
-        else:
-            response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "error": {
-                    "code": -32601,
-                    "message": f"Method not found: {method}"
-                }
-            }
-
-        async def response_generator():
-            yield f"data: {json.dumps(response)}\n\n"
-
-        return StreamingResponse(
-            response_generator(),
-            media_type="text/event-stream"
-        )
-
-    except json.JSONDecodeError:
-        response = {
-            "jsonrpc": "2.0",
-            "id": None,
-            "error": {
-                "code": -32700,
-                "message": "Parse error"
-            }
-        }
-
-        async def error_generator():
-            yield f"data: {json.dumps(response)}\n\n"
-
-        return StreamingResponse(
-            error_generator(),
-            media_type="text/event-stream"
-        )
-    except Exception as e:
-        response = {
-            "jsonrpc": "2.0",
-            "id": None,
-            "error": {
-                "code": -32603,
-                "message": f"Internal error: {str(e)}"
-            }
-        }
-
-        async def error_generator():
-            yield f"data: {json.dumps(response)}\n\n"
-
-        return StreamingResponse(
-            error_generator(),
-            media_type="text/event-stream"
-        )
+    status_code, response = await handle_rpc(request, "/sse", background_tasks)
+    if response is None:
+        return Response(status_code=status_code)
+    return sse_frame_response(response)
+
+
+# Production uvicorn settings: the C-backed event loop and HTTP parser shipped
+# with uvicorn[standard], no per-request access log, no proxy header rewriting
+UVICORN_KWARGS = dict(
+    reload=False,
+    loop="uvloop",
+    http="httptools",
+    access_log=False,
+    proxy_headers=False,
+)
 
 
 if __name__ == "__main__":
@@ -403,5 +413,6 @@ if __name__ == "__main__":
         "server:app",
         host=HOST,
         port=PORT,
-        reload=True
+        workers=WORKERS,
+        **UVICORN_KWARGS
     )
\ No newline at end of file
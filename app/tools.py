@@ -3,411 +3,528 @@
 Tool definitions and implementations for MCP server
 """
 
+import ast
 import asyncio
 import json
 import math
+import operator
 import random
 import shlex
-import subprocess
 import sys
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Sequence
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-import pytz
+import orjson
 from fastapi import Request
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
 try:
-    from .config import MAX_RANDOM_NUMBERS, COMMAND_TIMEOUT
-    from .logging_utils import log_request, create_tool_log_info
+    from .config import MAX_RANDOM_NUMBERS, COMMAND_TIMEOUT, COMMAND_OUTPUT_LIMIT, TOOL_RESULT_CACHE_SIZE, MEMOIZED_TOOLS
+    from .logging_utils import should_log, write_log_entry, create_tool_log_info, now_iso
 except ImportError:
-    from config import MAX_RANDOM_NUMBERS, COMMAND_TIMEOUT
-    from logging_utils import log_request, create_tool_log_info
+    from config import MAX_RANDOM_NUMBERS, COMMAND_TIMEOUT, COMMAND_OUTPUT_LIMIT, TOOL_RESULT_CACHE_SIZE, MEMOIZED_TOOLS
+    from logging_utils import should_log, write_log_entry, create_tool_log_info, now_iso
 
 # Create the MCP server instance
 server = Server("simple-utils-server")
 
-
-async def list_tools() -> list[Tool]:
-    """List available tools."""
-    return [
-        Tool(
-            name="get_current_time",
-            description="Get the current time in UTC and local timezone",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
+# strftime patterns for get_current_date formats other than iso and unix
+DATE_FORMATS = {
+    "us": "%m/%d/%Y",
+    "european": "%d/%m/%Y",
+}
+
+# Operators, functions and constants available to calculate
+CALC_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+CALC_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+CALC_FUNCTIONS = {k: v for k, v in math.__dict__.items() if not k.startswith("_") and callable(v)}
+CALC_CONSTANTS = {k: v for k, v in math.__dict__.items() if not k.startswith("_") and not callable(v)}
+
+
+@lru_cache(maxsize=1024)
+def parse_expression(expression: str) -> ast.expr:
+    """Parse a calculate expression, caching the tree for repeated inputs."""
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def evaluate_expression(node: ast.expr):
+    """Evaluate a parsed calculate expression limited to arithmetic and math functions."""
+    node_type = type(node)
+
+    if node_type is ast.Constant:
+        if type(node.value) in (int, float):
+            return node.value
+
+    elif node_type is ast.BinOp:
+        op = CALC_BINARY_OPERATORS.get(type(node.op))
+        if op:
+            return op(evaluate_expression(node.left), evaluate_expression(node.right))
+
+    elif node_type is ast.UnaryOp:
+        op = CALC_UNARY_OPERATORS.get(type(node.op))
+        if op:
+            return op(evaluate_expression(node.operand))
+
+    elif node_type is ast.Name:
+        if node.id in CALC_CONSTANTS:
+            return CALC_CONSTANTS[node.id]
+        raise NameError(f"name '{node.id}' is not defined")
+
+    elif node_type is ast.Call:
+        if type(node.func) is ast.Name and not node.keywords:
+            func = CALC_FUNCTIONS.get(node.func.id)
+            if func is None:
+                raise NameError(f"name '{node.func.id}' is not defined")
+            return func(*[evaluate_expression(arg) for arg in node.args])
+
+    raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+
+
+def dumps_result(result: dict) -> str:
+    """Serialize a tool result as compact JSON text; MCP clients parse it, so no pretty-printing."""
+    try:
+        return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS).decode()
+    except orjson.JSONEncodeError:
+        # Fall back for values orjson rejects, such as integers beyond 64 bits
+        return json.dumps(result, separators=(",", ":"))
+
+
+# Tool definitions, built once at import time
+TOOLS = [
+    Tool(
+        name="get_current_time",
+        description="Get the current time in UTC and local timezone",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="get_current_date",
+        description="Get the current date in various formats",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "format": {
+                    "type": "string",
+                    "description": "Date format: 'iso', 'us', 'european', or 'unix'",
+                    "enum": ["iso", "us", "european", "unix"],
+                    "default": "iso"
+                }
             },
-        ),
-        Tool(
-            name="get_current_date",
-            description="Get the current date in various formats",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "format": {
-                        "type": "string",
-                        "description": "Date format: 'iso', 'us', 'european', or 'unix'",
-                        "enum": ["iso", "us", "european", "unix"],
-                        "default": "iso"
-                    }
-                },
-                "required": [],
+            "required": [],
+        },
+    ),
+    Tool(
+        name="calculate",
+        description="Perform basic mathematical calculations",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "expression": {
+                    "type": "string",
+                    "description": "Mathematical expression to evaluate (e.g., '2 + 2', 'sqrt(16)', 'sin(pi/2)')"
+                }
             },
-        ),
-        Tool(
-            name="calculate",
-            description="Perform basic mathematical calculations",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "expression": {
-                        "type": "string",
-                        "description": "Mathematical expression to evaluate (e.g., '2 + 2', 'sqrt(16)', 'sin(pi/2)')"
-                    }
-                },
-                "required": ["expression"],
+            "required": ["expression"],
+        },
+    ),
+    Tool(
+        name="get_timezone_info",
+        description="Get information about a timezone",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "timezone": {
+                    "type": "string",
+                    "description": "Timezone name (e.g., 'UTC', 'America/New_York', 'Europe/London')",
+                    "default": "UTC"
+                }
             },
-        ),
-        Tool(
-            name="get_timezone_info",
-            description="Get information about a timezone",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "timezone": {
-                        "type": "string",
-                        "description": "Timezone name (e.g., 'UTC', 'America/New_York', 'Europe/London')",
-                        "default": "UTC"
-                    }
+            "required": [],
+        },
+    ),
+    Tool(
+        name="generate_random_number",
+        description="Generate a random number within a specified range",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "min_value": {
+                    "type": "number",
+                    "description": "Minimum value (inclusive)",
+                    "default": 1
                 },
-                "required": [],
-            },
-        ),
-        Tool(
-            name="generate_random_number",
-            description="Generate a random number within a specified range",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "min_value": {
-                        "type": "number",
-                        "description": "Minimum value (inclusive)",
-                        "default": 1
-                    },
-                    "max_value": {
-                        "type": "number",
-                        "description": "Maximum value (inclusive)",
-                        "default": 100
-                    },
-                    "count": {
-                        "type": "integer",
-                        "description": "Number of random numbers to generate",
-                        "default": 1,
-                        "minimum": 1,
-                        "maximum": 100
-                    }
+                "max_value": {
+                    "type": "number",
+                    "description": "Maximum value (inclusive)",
+                    "default": 100
                 },
-                "required": [],
+                "count": {
+                    "type": "integer",
+                    "description": "Number of random numbers to generate",
+                    "default": 1,
+                    "minimum": 1,
+                    "maximum": 100
+                }
             },
+            "required": [],
+        },
+    ),
+    Tool(
+        name="execute_command",
+        description=(
+            "Execute a shell command and return the output. Only the last "
+            f"{COMMAND_OUTPUT_LIMIT // (1024 * 1024)} MiB of stdout and of stderr are kept; "
+            "stdout_truncated/stderr_truncated report when earlier output was dropped. "
+            "WARNING: Use with caution as this can execute arbitrary commands."
         ),
-        Tool(
-            name="execute_command",
-            description="Execute a shell command and return the output. WARNING: Use with caution as this can execute arbitrary commands.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "command": {
-                        "type": "string",
-                        "description": "Shell command to execute (e.g., 'ls -la', 'echo hello', 'python --version')"
-                    },
-                    "working_directory": {
-                        "type": "string",
-                        "description": "Working directory for the command (optional, defaults to current directory)",
-                        "default": None
-                    },
-                    "timeout": {
-                        "type": "integer",
-                        "description": "Timeout in seconds (optional, defaults to 30 seconds)",
-                        "default": 30
-                    }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "command": {
+                    "type": "string",
+                    "description": "Shell command to execute (e.g., 'ls -la', 'echo hello', 'python --version')"
+                },
+                "working_directory": {
+                    "type": "string",
+                    "description": "Working directory for the command (optional, defaults to current directory)",
+                    "default": None
                 },
-                "required": ["command"],
+                "timeout": {
+                    "type": "integer",
+                    "description": "Timeout in seconds (optional, defaults to 30 seconds)",
+                    "default": 30
+                }
             },
-        ),
-    ]
+            "required": ["command"],
+        },
+    ),
+]
 
 
-@server.call_tool()
-async def call_tool(name: str, arguments: dict[str, Any], request: Request = None) -> Sequence[TextContent]:
-    """Handle tool calls."""
+async def list_tools() -> list[Tool]:
+    """List available tools."""
+    return TOOLS
 
-    # Prepare comprehensive logging information
-    log_info = create_tool_log_info(name, arguments, request)
 
-    if name == "get_current_time":
-        now = datetime.now(timezone.utc)
-        local_now = datetime.now()
+# Memoized results of pure tools: (name, sorted-argument JSON) -> result
+_result_cache: Dict[tuple, dict] = {}
 
-        result = {
-            "utc_time": now.strftime("%Y-%m-%d %H:%M:%S UTC"),
-            "local_time": local_now.strftime("%Y-%m-%d %H:%M:%S"),
-            "unix_timestamp": int(now.timestamp()),
-            "iso_format": now.isoformat(),
-        }
 
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_info["success"] = True
-        log_request(log_info)
-
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
-
-    elif name == "get_current_date":
-        now = datetime.now()
-        format_type = arguments.get("format", "iso")
-
-        if format_type == "us":
-            formatted_date = now.strftime("%m/%d/%Y")
-        elif format_type == "european":
-            formatted_date = now.strftime("%d/%m/%Y")
-        elif format_type == "unix":
-            formatted_date = str(int(now.timestamp()))
-        else:  # iso
-            formatted_date = now.strftime("%Y-%m-%d")
+def result_cache_key(name: str, arguments: dict) -> Optional[tuple]:
+    """Build the memoization key for a tool call, or None if its result isn't cacheable."""
+    if name not in MEMOIZED_TOOLS:
+        return None
+    try:
+        return name, orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS)
+    except (orjson.JSONEncodeError, TypeError):
+        return None
 
-        result = {
-            "date": formatted_date,
-            "format": format_type,
-            "unix_timestamp": int(now.timestamp()),
-            "iso_format": now.strftime("%Y-%m-%d")
-        }
 
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_info["success"] = True
-        log_request(log_info)
+def get_cached_result(key: Optional[tuple]) -> Optional[dict]:
+    """Return the memoized result for key, if any."""
+    if key is None:
+        return None
+    return _result_cache.get(key)
 
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
 
-    elif name == "calculate":
-        expression = arguments.get("expression", "")
+def cache_result(key: Optional[tuple], result: dict) -> None:
+    """Memoize a successful tool result, evicting the oldest entry when full."""
+    if key is None:
+        return
+    if len(_result_cache) >= TOOL_RESULT_CACHE_SIZE:
+        del _result_cache[next(iter(_result_cache))]
+    _result_cache[key] = result
 
-        if not expression.strip():
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": "Expression is required"}, indent=2)
-            )]
 
-        try:
-            # Safe evaluation of mathematical expressions
-            # Only allow safe mathematical operations
-            allowed_names = {
-                k: v for k, v in math.__dict__.items() if not k.startswith("__")
-            }
-            allowed_names.update({"__builtins__": {}})
+def finish_tool_call(log_info: Optional[dict], result: dict, error: str = None) -> list[TextContent]:
+    """Log a finished tool call (unless log_info is None) and wrap its result as text content."""
+    if log_info is not None:
+        log_info["timestamp_end"] = now_iso()
+        log_info["response"] = result
+        log_info["success"] = error is None
+        if error is not None:
+            log_info["error"] = error
+        write_log_entry(log_info)
+
+    return [TextContent(
+        type="text",
+        text=dumps_result(result)
+    )]
+
+
+async def tool_get_current_time(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Get the current UTC and local time."""
+    # Read the clock once and derive every view from that single reading
+    t = time.time()
+
+    # time.strftime on a struct_time is several times cheaper than datetime.strftime
+    result = {
+        "utc_time": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(t)),
+        "local_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+        "unix_timestamp": int(t),
+        "iso_format": datetime.fromtimestamp(t, timezone.utc).isoformat(),
+    }
+    return result, None
+
+
+async def tool_get_current_date(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Get the current date in the requested format."""
+    t = time.time()
+    unix_timestamp = int(t)
+    today = time.localtime(t)
+    iso_date = time.strftime("%Y-%m-%d", today)
+    format_type = arguments.get("format", "iso")
+
+    date_format = DATE_FORMATS.get(format_type) if isinstance(format_type, str) else None
+    if date_format is not None:
+        formatted_date = time.strftime(date_format, today)
+    elif format_type == "unix":
+        formatted_date = str(unix_timestamp)
+    else:  # iso
+        formatted_date = iso_date
+
+    result = {
+        "date": formatted_date,
+        "format": format_type,
+        "unix_timestamp": unix_timestamp,
+        "iso_format": iso_date
+    }
+    return result, None
+
+
+async def tool_calculate(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Evaluate a mathematical expression."""
+    expression = arguments.get("expression", "")
+
+    if not expression.strip():
+        return {"error": "Expression is required"}, "Expression is required"
+
+    try:
+        # Safe evaluation of mathematical expressions, without eval
+        result_value = evaluate_expression(parse_expression(expression))
+    except Exception as e:
+        result = {
+            "expression": expression,
+            "error": f"Calculation error: {str(e)}",
+            "type": "error"
+        }
+        return result, str(e)
 
-            result_value = eval(expression, allowed_names)
-            result = {
-                "expression": expression,
-                "result": result_value,
-                "type": type(result_value).__name__
-            }
+    result = {
+        "expression": expression,
+        "result": result_value,
+        "type": type(result_value).__name__
+    }
+    return result, None
 
-        except Exception as e:
-            result = {
-                "expression": expression,
-                "error": f"Calculation error: {str(e)}",
-                "type": "error"
-            }
-            log_info["success"] = False
-            log_info["error"] = str(e)
 
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_request(log_info)
-
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
+@lru_cache(maxsize=512)
+def get_timezone(name: str) -> ZoneInfo:
+    """Resolve an IANA timezone name, caching the tzinfo object."""
+    return ZoneInfo(name)
 
-    elif name == "get_timezone_info":
-        timezone_name = arguments.get("timezone", "UTC")
 
-        try:
-            tz = pytz.timezone(timezone_name)
-            now = datetime.now(tz)
+async def tool_get_timezone_info(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Get the current time and offset for a timezone."""
+    timezone_name = arguments.get("timezone", "UTC")
 
+    try:
+        tz = get_timezone(timezone_name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        result = {
+            "error": f"Unknown timezone: {timezone_name}",
+            "available_timezones": "Use IANA timezone names such as Europe/London"
+        }
+        return result, f"Unknown timezone: {timezone_name}"
+
+    now = datetime.now(tz)
+    result = {
+        "timezone": timezone_name,
+        "current_time": now.strftime("%Y-%m-%d %H:%M:%S %Z"),
+        "utc_offset": now.strftime("%z"),
+        "is_dst": bool(now.dst()),
+        "timezone_info": str(tz)
+    }
+    return result, None
+
+
+async def tool_generate_random_number(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Generate one or more random numbers within a range."""
+    min_value = arguments.get("min_value", 1)
+    max_value = arguments.get("max_value", 100)
+    count = arguments.get("count", 1)
+
+    # Validate inputs
+    if not isinstance(min_value, (int, float)):
+        error = "min_value must be a number"
+    elif not isinstance(max_value, (int, float)):
+        error = "max_value must be a number"
+    elif min_value >= max_value:
+        error = "min_value must be less than max_value"
+    elif not isinstance(count, int) or count < 1 or count > MAX_RANDOM_NUMBERS:
+        error = f"count must be an integer between 1 and {MAX_RANDOM_NUMBERS}"
+    else:
+        error = None
+    if error is not None:
+        return {"error": error}, error
+
+    try:
+        if count == 1:
+            # Single random number
+            random_number = random.uniform(min_value, max_value)
             result = {
-                "timezone": timezone_name,
-                "current_time": now.strftime("%Y-%m-%d %H:%M:%S %Z"),
-                "utc_offset": now.strftime("%z"),
-                "is_dst": now.dst() != datetime.timedelta(0),
-                "timezone_info": str(tz)
+                "random_number": random_number,
+                "min_value": min_value,
+                "max_value": max_value,
+                "type": "single"
             }
-
-        except pytz.exceptions.UnknownTimeZoneError:
+        else:
+            # Multiple random numbers
+            random_numbers = [random.uniform(min_value, max_value) for _ in range(count)]
             result = {
-                "error": f"Unknown timezone: {timezone_name}",
-                "available_timezones": "Use pytz.common_timezones for valid timezone names"
+                "random_numbers": random_numbers,
+                "count": count,
+                "min_value": min_value,
+                "max_value": max_value,
+                "type": "multiple"
             }
-            log_info["success"] = False
-            log_info["error"] = f"Unknown timezone: {timezone_name}"
-
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_request(log_info)
-
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
-
-    elif name == "generate_random_number":
-        min_value = arguments.get("min_value", 1)
-        max_value = arguments.get("max_value", 100)
-        count = arguments.get("count", 1)
-
-        # Validate inputs
-        if not isinstance(min_value, (int, float)):
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": "min_value must be a number"}, indent=2)
-            )]
-        if not isinstance(max_value, (int, float)):
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": "max_value must be a number"}, indent=2)
-            )]
-        if min_value >= max_value:
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": "min_value must be less than max_value"}, indent=2)
-            )]
-        if not isinstance(count, int) or count < 1 or count > MAX_RANDOM_NUMBERS:
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": f"count must be an integer between 1 and {MAX_RANDOM_NUMBERS}"}, indent=2)
-            )]
-
-        try:
-            if count == 1:
-                # Single random number
-                random_number = random.uniform(min_value, max_value)
-                result = {
-                    "random_number": random_number,
-                    "min_value": min_value,
-                    "max_value": max_value,
-                    "type": "single"
-                }
-            else:
-                # Multiple random numbers
-                random_numbers = [random.uniform(min_value, max_value) for _ in range(count)]
-                result = {
-                    "random_numbers": random_numbers,
-                    "count": count,
-                    "min_value": min_value,
-                    "max_value": max_value,
-                    "type": "multiple"
-                }
-
-        except Exception as e:
-            result = {"error": f"Random number generation error: {str(e)}"}
-            log_info["success"] = False
-            log_info["error"] = str(e)
-
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_request(log_info)
-
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
-
-    elif name == "execute_command":
-        command = arguments.get("command", "")
-        working_directory = arguments.get("working_directory")
-        timeout = arguments.get("timeout", COMMAND_TIMEOUT)
-
-        if not command.strip():
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": "Command is required"}, indent=2)
-            )]
 
+    except Exception as e:
+        return {"error": f"Random number generation error: {str(e)}"}, str(e)
+
+    return result, None
+
+
+@lru_cache(maxsize=2048)
+def split_command(command: str) -> tuple[str, ...]:
+    """Split a command line into arguments, caching the parse (the command still runs every call)."""
+    return tuple(shlex.split(command))
+
+
+async def read_output(stream: asyncio.StreamReader, limit: int = COMMAND_OUTPUT_LIMIT) -> tuple[bytearray, bool]:
+    """Read a subprocess stream to EOF, keeping only its last `limit` bytes.
+
+    Returns the kept bytes and whether anything before them was discarded.
+    """
+    buffer = bytearray()
+    truncated = False
+    while chunk := await stream.read(65536):
+        buffer += chunk
+        if len(buffer) > limit:
+            del buffer[:-limit]
+            truncated = True
+    return buffer, truncated
+
+
+async def tool_execute_command(arguments: dict) -> tuple[dict, Optional[str]]:
+    """Run a shell command without blocking the event loop."""
+    command = arguments.get("command", "")
+    working_directory = arguments.get("working_directory")
+    timeout = arguments.get("timeout", COMMAND_TIMEOUT)
+
+    if not command.strip():
+        return {"error": "Command is required"}, "Command is required"
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))):
+        return {"command": command, "error": "timeout must be a number of seconds"}, "timeout must be a number of seconds"
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *split_command(command),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=working_directory
+        )
+        # Drain both pipes concurrently so memory stays bounded however much a command prints
+        drain = asyncio.gather(read_output(process.stdout), read_output(process.stderr), process.wait())
         try:
-            # Execute the command
-            process = subprocess.run(
-                shlex.split(command),
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=working_directory
-            )
-
-            result = {
-                "command": command,
-                "return_code": process.returncode,
-                "stdout": process.stdout,
-                "stderr": process.stderr,
-                "success": process.returncode == 0,
-                "working_directory": working_directory or "current directory",
-                "timeout_used": timeout
-            }
-
-        except subprocess.TimeoutExpired:
-            result = {
-                "command": command,
-                "error": f"Command timed out after {timeout} seconds",
-                "timeout": timeout
-            }
-            log_info["success"] = False
-            log_info["error"] = f"Command timeout: {timeout}s"
+            (stdout, stdout_truncated), (stderr, stderr_truncated), _ = await asyncio.wait_for(drain, timeout=timeout)
+        except BaseException:
+            # Timeout, cancellation or any other failure: never leave the child running
+            process.kill()
+            await process.wait()
+            if drain.done() and not drain.cancelled():
+                drain.exception()  # mark the interrupted drain's error as handled
+            raise
+
+    except asyncio.TimeoutError:
+        result = {
+            "command": command,
+            "error": f"Command timed out after {timeout} seconds",
+            "timeout": timeout
+        }
+        return result, f"Command timeout: {timeout}s"
 
-        except Exception as e:
-            result = {
-                "command": command,
-                "error": f"Command execution error: {str(e)}"
-            }
-            log_info["success"] = False
-            log_info["error"] = str(e)
+    except Exception as e:
+        result = {
+            "command": command,
+            "error": f"Command execution error: {str(e)}"
+        }
+        return result, str(e)
+
+    result = {
+        "command": command,
+        "return_code": process.returncode,
+        "stdout": stdout.decode(errors="replace"),
+        "stderr": stderr.decode(errors="replace"),
+        "stdout_truncated": stdout_truncated,
+        "stderr_truncated": stderr_truncated,
+        "success": process.returncode == 0,
+        "working_directory": working_directory or "current directory",
+        "timeout_used": timeout
+    }
+    return result, None
+
+
+# Tool dispatch table; each handler returns (result, error)
+TOOL_HANDLERS = {
+    "get_current_time": tool_get_current_time,
+    "get_current_date": tool_get_current_date,
+    "calculate": tool_calculate,
+    "get_timezone_info": tool_get_timezone_info,
+    "generate_random_number": tool_generate_random_number,
+    "execute_command": tool_execute_command,
+}
 
-        # Log the response
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = result
-        log_request(log_info)
 
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, indent=2)
-        )]
+@server.call_tool()
+async def call_tool(name: str, arguments: dict[str, Any], request: Request = None) -> Sequence[TextContent]:
+    """Handle tool calls."""
 
-    else:
-        error_result = {"error": f"Unknown tool: {name}"}
-
-        # Log the unknown tool error
-        log_info["timestamp_end"] = datetime.now(timezone.utc).isoformat()
-        log_info["response"] = error_result
-        log_info["success"] = False
-        log_info["error"] = f"Unknown tool: {name}"
-        log_request(log_info)
-
-        return [TextContent(
-            type="text",
-            text=json.dumps(error_result, indent=2)
-        )]
\ No newline at end of file
+    # Prepare comprehensive logging information, skipped when this call isn't logged
+    log_info = create_tool_log_info(name, arguments, request) if should_log() else None
+
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        error = f"Unknown tool: {name}"
+        return finish_tool_call(log_info, {"error": error}, error)
+
+    # Pure tools answer repeated calls from the memoized result
+    cache_key = result_cache_key(name, arguments)
+    cached = get_cached_result(cache_key)
+    if cached is not None:
+        if log_info is not None:
+            log_info["cached"] = True
+        return finish_tool_call(log_info, cached)
+
+    result, error = await handler(arguments)
+    if error is None:
+        cache_result(cache_key, result)
+    return finish_tool_call(log_info, result, error)